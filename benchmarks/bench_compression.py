@@ -0,0 +1,66 @@
+"""Find the message size at which compressing the requests and responses pays off.
+
+Run with:
+
+    $ python benchmarks/bench_compression.py
+
+For json messages of increasing size, the time to compress and decompress is measured and compared to the time saved on the
+transfer at several bandwidths. The crossover is the smallest size for which compression is faster overall; it is a good value
+for the --compress-threshold option of the server.
+"""
+
+import json
+import random
+import time
+
+from pynodered.compression import compress, decompress, supported_encodings
+
+BANDWIDTHS = {"10 Mbit/s": 10e6 / 8, "100 Mbit/s": 100e6 / 8, "1 Gbit/s": 1e9 / 8}
+
+
+def make_message(size):
+    rng = random.Random(0)
+    records, length = [], 0
+    while length < size:
+        records.append({'time': rng.random() * 1e9, 'sensor': "sensor%i" % rng.randint(0, 20),
+                        'value': round(rng.gauss(20, 5), 3), 'status': rng.choice(["ok", "warning", "error"])})
+        length += len(json.dumps(records[-1])) + 2
+    return json.dumps({'msg': {'_msgid': "1", 'topic': "data", 'payload': records}, 'config': {}}).encode('utf-8')
+
+
+def measure(data, encoding, repeat):
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        compressed = compress(data, encoding)
+    for i in range(repeat):
+        decompress(compressed, encoding)
+    t2 = time.perf_counter()
+    return len(compressed), (t2 - t0) / repeat
+
+
+def main():
+    sizes = [2 ** k for k in range(7, 23)]
+    for encoding in supported_encodings():
+        print("%s" % encoding)
+        print("%10s %8s %12s  %s" % ("size", "ratio", "codec (ms)", "  ".join("%12s" % b for b in BANDWIDTHS)))
+        crossover = {b: None for b in BANDWIDTHS}  # smallest size from which compression is always faster
+        for size in sizes:
+            data = make_message(size)
+            csize, codec_time = measure(data, encoding, repeat=max(1, 2 ** 20 // len(data)))
+            gains = []
+            for name, bw in BANDWIDTHS.items():
+                gain = (len(data) - csize) / bw - codec_time  # positive if compression is faster
+                gains.append(gain)
+                if gain <= 0:
+                    crossover[name] = None
+                elif crossover[name] is None:
+                    crossover[name] = len(data)
+            print("%10i %8.2f %12.3f  %s" % (len(data), len(data) / csize, 1e3 * codec_time,
+                                              "  ".join("%+10.3fms" % (1e3 * g) for g in gains)))
+        for name, size in crossover.items():
+            print("crossover at %s: %s" % (name, "%i bytes" % size if size else "never in the tested range"))
+        print()
+
+
+if __name__ == '__main__':
+    main()
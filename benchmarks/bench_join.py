@@ -0,0 +1,67 @@
+"""Compare the throughput of the Join storages for 2, 4 and 8 topics.
+
+Run with:
+
+    $ python benchmarks/bench_join.py
+
+For each number of topics, a single process pushes all the parts of the messages in the in-memory storage and in the SQLite
+storage. The SQLite storage is also measured with one process per topic sharing the same database, which is the situation of
+several pynodered workers.
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+
+from pynodered.storage import MemoryStorage, SQLiteStorage
+
+
+def push_all(storage, topics, n, only_topic=None):
+    completed = 0
+    for i in range(n):
+        for topic in topics:
+            if only_topic is None or topic == only_topic:
+                if storage.push("bench", str(i), topic, {'value': i}, topics) is not None:
+                    completed += 1
+    return completed
+
+
+def _worker(path, topics, n, topic):
+    push_all(SQLiteStorage(path), topics, n, only_topic=topic)
+
+
+def bench(ntopics, n):
+    topics = ["topic%i" % i for i in range(ntopics)]
+    results = {}
+
+    t0 = time.perf_counter()
+    assert push_all(MemoryStorage(), topics, n) == n
+    results['memory'] = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        t0 = time.perf_counter()
+        assert push_all(SQLiteStorage(os.path.join(tmpdir, "a.db")), topics, n) == n
+        results['sqlite'] = time.perf_counter() - t0
+
+        path = os.path.join(tmpdir, "b.db")
+        SQLiteStorage(path)
+        procs = [multiprocessing.Process(target=_worker, args=(path, topics, n, topic)) for topic in topics]
+        t0 = time.perf_counter()
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        results['sqlite, %i processes' % ntopics] = time.perf_counter() - t0
+
+    for name, t in results.items():
+        print("%i topics  %-22s: %10.0f joined messages/s" % (ntopics, name, n / t))
+
+
+def main(n=2000):
+    for ntopics in (2, 4, 8):
+        bench(ntopics, n)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Compare the overhead of the JSON-RPC route (/) and of the direct route (/<name>).
+
+Run with:
+
+    $ python benchmarks/bench_routes.py
+
+The Flask test client is used so that the network is not measured, only the request handling in pynodered.
+"""
+
+import timeit
+
+from pynodered import node_red
+from pynodered import server
+
+
+@node_red(category="bench")
+def bench_identity(node, msg):
+    return msg
+
+
+def main(number=5000):
+    server.register_node(bench_identity)
+    client = server.app.test_client()
+
+    msg = {'_msgid': '1', 'topic': 't', 'payload': 'x' * 100}
+    jsonrpc_body = {'jsonrpc': '2.0', 'method': 'bench_identity', 'id': '1', 'params': {'msg': msg, 'config': {}}}
+    direct_body = {'msg': msg, 'config': {}}
+
+    t_jsonrpc = timeit.timeit(lambda: client.post('/', json=jsonrpc_body), number=number)
+    t_direct = timeit.timeit(lambda: client.post('/bench_identity', json=direct_body), number=number)
+
+    print("JSON-RPC  /               : %.1f us/call" % (1e6 * t_jsonrpc / number))
+    print("direct    /bench_identity : %.1f us/call" % (1e6 * t_direct / number))
+
+
+if __name__ == '__main__':
+    main()
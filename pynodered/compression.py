@@ -0,0 +1,118 @@
+"""Compression of the requests and responses exchanged with Node-RED.
+
+CompressionMiddleware wraps a WSGI application. It decompresses the requests sent with a 'Content-Encoding: gzip' (or zstd)
+header and, when a threshold is given, compresses the responses larger than the threshold with the best encoding accepted by the
+client ('Accept-Encoding'). zstd is used only if the optional 'zstandard' package is installed.
+"""
+
+import gzip
+import io
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def compress(data, encoding):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor().compress(data)
+    raise ValueError("unsupported encoding: %s" % encoding)
+
+
+def decompress(data, encoding):
+    """decompress data, raise ValueError if the encoding is not supported or data is corrupt"""
+    if encoding == "gzip":
+        try:
+            return gzip.decompress(data)
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(str(e))
+    if encoding == "zstd" and zstandard is not None:
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        try:
+            data = decompressor.decompress(data)
+        except zstandard.ZstdError as e:
+            raise ValueError(str(e))
+        if not decompressor.eof:
+            raise ValueError("truncated zstd data")
+        return data
+    raise ValueError("unsupported encoding: %s" % encoding)
+
+
+def supported_encodings():
+    """return the supported encodings in order of preference"""
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def accepted_encodings(accept_encoding):
+    """return the set of the encodings listed in the Accept-Encoding header"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        parts = item.strip().split(";")
+        if any(p.strip() in ("q=0", "q=0.0") for p in parts[1:]):
+            continue
+        accepted.add(parts[0].strip().lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    """return the preferred supported encoding listed in the Accept-Encoding header, or None"""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in supported_encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+class CompressionMiddleware(object):
+    """WSGI middleware decompressing the requests and compressing the responses of at least threshold bytes. If threshold is
+    None, the responses are never compressed."""
+
+    def __init__(self, app, threshold=None):
+        self.app = app
+        self.threshold = threshold
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding and encoding != "identity":
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            try:
+                body = decompress(environ['wsgi.input'].read(length), encoding)
+            except (ValueError, OSError, EOFError) as e:
+                start_response("415 Unsupported Media Type", [('Content-Type', "text/plain")])
+                return [str(e).encode('utf-8')]
+            environ['wsgi.input'] = io.BytesIO(body)
+            environ['CONTENT_LENGTH'] = str(len(body))
+            del environ['HTTP_CONTENT_ENCODING']
+
+        response_encoding = None
+        if self.threshold is not None:
+            response_encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if response_encoding is None:
+            return self.app(environ, start_response)
+
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured['status'], captured['headers'] = status, headers
+            return lambda data: None  # the write callable is not used by Flask
+
+        result = self.app(environ, capture_start_response)
+        try:
+            body = b"".join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+        headers = captured['headers']
+        already_encoded = any(k.lower() == 'content-encoding' for k, v in headers)
+        if len(body) >= self.threshold and not already_encoded:
+            body = compress(body, response_encoding)
+            headers = [(k, v) for k, v in headers if k.lower() != 'content-length']
+            headers += [('Content-Encoding', response_encoding), ('Content-Length', str(len(body))),
+                        ('Vary', "Accept-Encoding")]
+        start_response(captured['status'], headers)
+        return [body]
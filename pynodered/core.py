@@ -1,8 +1,11 @@
 import os
-import collections
+import collections.abc
 import json
 from pathlib import Path
 
+from pynodered.storage import MemoryStorage
+from pynodered.executors import EXECUTORS
+
 
 class NodeProperty(object):
     """a Node property. This is usually use to decalre field in a class deriving from RNBaseNode.
@@ -46,10 +49,19 @@ class RNBaseNode(metaclass=FormMetaClass):
     """
 
     rednode_template = "httprequest"
+    executor = "inline"  # "inline", "thread" or "process", see pynodered.executors
+    workers = None  # size of the pool of the thread and process executors
+
+    @classmethod
+    def warmup(cls):
+        """called once by the server when it starts, in parallel with the warm-up of the other nodes. Override it to load models,
+        open connection pools, etc. The server already accepts requests during the warm-up and does not block them: /ready answers
+        503 until all warm-ups are done and the callers must check it (the generated Node-RED blocks and the router do)."""
+        pass
 
     # based on SFNR code (GPL v3)
     @classmethod
-    def install(cls, node_dir, port):
+    def install(cls, node_dir, port, compress_threshold=None):
 
         try:
             os.mkdir(node_dir)
@@ -60,11 +72,11 @@ class RNBaseNode(metaclass=FormMetaClass):
             in_path = Path(__file__).parent / "templates" / ("%s.%s.in" % (cls.rednode_template, ext))
             out_path = node_dir / ("%s.%s" % (cls.name, ext))
 
-            cls._install_template(in_path, out_path, node_dir, port)
+            cls._install_template(in_path, out_path, node_dir, port, compress_threshold)
 
     # based on SFNR code (GPL)
     @classmethod
-    def _install_template(cls, in_path, out_path, node_dir, port):
+    def _install_template(cls, in_path, out_path, node_dir, port, compress_threshold=None):
 
         defaults = {}
         form = ""
@@ -115,6 +127,7 @@ class RNBaseNode(metaclass=FormMetaClass):
         t = open(in_path).read()
 
         t = t % {'port': port,
+                 'compress_threshold': compress_threshold if compress_threshold is not None else 0,
                  'name': cls.name,
                  'title': cls.title,
                  'icon': cls.icon,
@@ -159,44 +172,58 @@ class Join(object):
 with the excepted_topics arrive. While waiting the Join instance raise NodeWaiting exception which is understood by the server which then silently inform node-red
 to continue without error. Once all the message with the expected topics are arrived, the instance return the messages list in the order of expected_topics.
 
+The partial messages are kept by default in the memory of the process (MemoryStorage). To share them between several worker processes,
+use a shared storage such as pynodered.storage.SQLiteStorage. The messages are stored under the name of the join, which is by default
+the name of the node it is attached to by node_red.
 """
 
-    def __init__(self, expected_topics):
-        self.mem = collections.defaultdict(dict)
+    def __init__(self, expected_topics, storage=None, name=None):
+        self.storage = storage if storage is not None else MemoryStorage()
+        self.name = name
         self.expected_topics = expected_topics
 
+    @property
+    def namespace(self):
+        return self.name if self.name is not None else ""
+
     def __call__(self, msg):
-        self.push(msg)
-        if not self.ready(msg):
+        msgs = self.storage.push(self.namespace, msg['_msgid'], msg['topic'], msg['payload'], self.expected_topics)
+        if msgs is None:
             raise NodeWaiting
-        return self.pop(msg)
+        return [msgs[topic] for topic in self.expected_topics]
 
     def push(self, msg):
-        self.mem[msg['_msgid']][msg['topic']] = msg['payload']
+        self.storage.push(self.namespace, msg['_msgid'], msg['topic'], msg['payload'], None)
 
     def ready(self, msg):
+        msgs = self.storage.get(self.namespace, msg['_msgid'])
         for topic in self.expected_topics:
-            if topic not in self.mem[msg['_msgid']]:
+            if topic not in msgs:
                 return False
         return True
 
     def get_messages(self, msg):
-        return [self.mem[msg['_msgid']][topic] for topic in self.expected_topics]
+        msgs = self.storage.get(self.namespace, msg['_msgid'])
+        return [msgs[topic] for topic in self.expected_topics]
 
     def pop(self, msg):
-        msgs = self.mem.pop(msg['_msgid'])
+        msgs = self.storage.pop(self.namespace, msg['_msgid'])
         return [msgs[topic] for topic in self.expected_topics]
 
     def clean(self, msg):
-        del self._cache[msg['_msgid']]
+        self.storage.pop(self.namespace, msg['_msgid'])
 
 
 def node_red(name=None, title=None, category="default", description=None,
-             join=None, baseclass=RNBaseNode, properties=None, icon=None, color=None, outputs=1, output_labels=None):
+             join=None, baseclass=RNBaseNode, properties=None, icon=None, color=None, outputs=1, output_labels=None,
+             warmup=None, executor=None, workers=None):
     """decorator to make a python function available in node-red. The function must take two arguments, node and msg.
     msg is a dictionary with all the pairs of keys and value sent by node-red. Most interesting keys are 'payload', 'topic' and 'msgid_'.
     The node argument is an instance of the underlying class created by this decorator. It can be useful when you have a defined a common subclass
-    of RNBaseNode that provided specific features for your application (usually database connection and similar). """
+    of RNBaseNode that provided specific features for your application (usually database connection and similar).
+    The optional warmup function takes the node class as argument and is called once by the server when it starts (see RNBaseNode.warmup).
+    executor selects how the function is run: "inline" in the request thread (default), "thread" in a thread pool or "process" in a
+    process pool for CPU-bound functions. workers is the size of the pool. """
 
     def wrapper(func):
         attrs = dict()
@@ -217,10 +244,24 @@ def node_red(name=None, title=None, category="default", description=None,
         if join is not None:
             if isinstance(join, Join):
                 attrs['join'] = join
-            elif isinstance(join, collections.Sequence):
+            elif isinstance(join, collections.abc.Sequence):
                 attrs['join'] = Join(join)
             else:
                 raise Exception("join must be a Join object or a sequence of topic (str)")
+            if attrs['join'].name is None:
+                attrs['join'].name = attrs['name']
+
+        if executor is not None:
+            if executor not in EXECUTORS:
+                raise Exception("executor must be one of %s" % ", ".join(EXECUTORS))
+            attrs['executor'] = executor
+        if workers is not None:
+            attrs['workers'] = workers
+
+        node_join = attrs.get('join', getattr(baseclass, 'join', None))
+        if node_join is not None and isinstance(node_join.storage, MemoryStorage) and \
+                attrs.get('executor', baseclass.executor) == "process" and attrs.get('workers', baseclass.workers) != 1:
+            raise Exception("a join with the process executor needs a storage shared by the worker processes, e.g. SQLiteStorage")
 
         if properties is not None:
             if not isinstance(properties, dict):
@@ -228,6 +269,9 @@ def node_red(name=None, title=None, category="default", description=None,
             for k in properties:
                 attrs[k] = properties[k]
 
+        if warmup is not None:
+            attrs['warmup'] = classmethod(warmup)
+
         attrs['work'] = func
         cls = FormMetaClass(attrs['name'], (baseclass,), attrs)
 
@@ -0,0 +1,139 @@
+"""Executors running the nodes: inline in the request thread, in a thread pool or in a process pool.
+
+The executor of a node is selected with the 'executor' argument of the node_red decorator. In all the cases, the result of run is
+returned and the exceptions it raises (including NodeWaiting) are raised again in the request thread.
+"""
+
+import multiprocessing
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+EXECUTORS = ("inline", "thread", "process")
+
+
+class InlineRunner(object):
+    """run the node directly in the request thread, without dispatch overhead"""
+
+    def __init__(self, obj, workers=None):
+        self.name = obj.name
+        self.obj = obj
+        self.inst = obj()
+
+    def __call__(self, msg, config):
+        return self.inst.run(msg, config)
+
+    def warmup(self):
+        self.obj.warmup()
+
+    def shutdown(self):
+        pass
+
+
+class ThreadRunner(InlineRunner):
+    """run the node in a thread pool of its own, which limits the number of concurrent calls to workers"""
+
+    def __init__(self, obj, workers=None):
+        super().__init__(obj)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def __call__(self, msg, config):
+        return self.pool.submit(self.inst.run, msg, config).result()
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+# the node instance in a worker process of a ProcessRunner
+_worker_inst = None
+
+
+def _init_worker(obj):
+    # a failing warm-up must not kill the worker, otherwise the whole pool is broken
+    global _worker_inst
+    try:
+        obj.warmup()
+    except Exception:
+        print("Warm-up of %s failed:" % obj.name)
+        traceback.print_exc()
+    _worker_inst = obj()
+
+
+def _run_in_worker(msg, config):
+    return _worker_inst.run(msg, config)
+
+
+def _ping():
+    return True
+
+
+class ProcessRunner(object):
+    """run the node in a process pool of its own, for CPU-bound nodes. Each worker process has its own instance of the node and
+    runs the warm-up of the node when it starts. msg, config and the result are pickled between the processes.
+
+    The worker processes are forked when possible so that nodes loaded from files are available in the workers. They are started
+    when the runner is created, i.e. by register_node in the main thread before the server starts its threads, because forking a
+    multi-threaded process may deadlock the children. State kept in
+    the node (e.g. the partial messages of a Join in the default MemoryStorage) is not shared between the workers.
+
+    If a worker dies (crash, killed by the OOM killer, ...), the pool is broken and is replaced by a new one. The call running in
+    the dead worker fails, a call that could not be submitted to the broken pool is submitted again to the new pool."""
+
+    def __init__(self, obj, workers=None):
+        self.name = obj.name
+        self.obj = obj
+        self.workers = workers or multiprocessing.cpu_count()
+        self._lock = threading.Lock()
+        self.pool = self._make_pool()
+
+    def _make_pool(self):
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context()
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(self.obj,))
+        # start all the workers now, each of them runs the warm-up of the node
+        self._started = [pool.submit(_ping) for i in range(self.workers)]
+        return pool
+
+    def _replace_pool(self, broken):
+        with self._lock:
+            if self.pool is broken:  # another thread may have replaced it already
+                self.pool = self._make_pool()
+                broken.shutdown(wait=False)
+            return self.pool
+
+    def submit(self, f, *args):
+        pool = self.pool
+        try:
+            future = pool.submit(f, *args)
+        except BrokenProcessPool:
+            # nothing has run, it is safe to submit again
+            pool = self._replace_pool(pool)
+            future = pool.submit(f, *args)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # the worker died while running the call, which is not run again
+            self._replace_pool(pool)
+            raise
+
+    def __call__(self, msg, config):
+        return self.submit(_run_in_worker, msg, config)
+
+    def warmup(self):
+        # wait until all the workers have started and run their warm-up
+        for f in self._started:
+            f.result()
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+def make_runner(obj):
+    """return a callable run(msg, config) for the node class obj according to its executor and workers attributes"""
+    runners = {"inline": InlineRunner, "thread": ThreadRunner, "process": ProcessRunner}
+    return runners[obj.executor](obj, workers=obj.workers)
@@ -0,0 +1,206 @@
+"""Router mode of the pynodered server: the RPC traffic from Node-RED is forwarded to a pool of pynodered backends.
+
+The router accepts the same requests as a normal pynodered server (the JSON-RPC endpoint / and the direct routes /<name>) and
+forwards them to the healthy backend with the least requests in flight. The messages of nodes with a Join are instead routed by
+consistent hashing of their '_msgid', so that all the parts of a join land on the same backend.
+"""
+
+import bisect
+import hashlib
+import http.client
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from flask import Flask, request, Response
+
+from pynodered.compression import compress, decompress, accepted_encodings, supported_encodings
+
+
+class Backend(object):
+    """a pynodered server to which the router forwards the requests"""
+
+    def __init__(self, url):
+        if "://" not in url:
+            url = "http://" + url
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.inflight = 0
+
+
+class HashRing(object):
+    """consistent hashing of keys over a list of backends. Each backend is placed at several points (replicas) on the ring
+    so that the keys are evenly distributed and only the keys of a removed backend move to another backend."""
+
+    def __init__(self, backends, replicas=100):
+        self.points = []
+        for backend in backends:
+            for i in range(replicas):
+                self.points.append((self._hash("%s#%i" % (backend.url, i)), backend))
+        self.points.sort(key=lambda p: p[0])
+        self.keys = [p[0] for p in self.points]
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+    def lookup(self, key, accept=lambda backend: True):
+        """return the first backend on the ring after key which is accepted, or None"""
+        if not self.points:
+            return None
+        start = bisect.bisect(self.keys, self._hash(key))
+        for i in range(len(self.points)):
+            backend = self.points[(start + i) % len(self.points)][1]
+            if accept(backend):
+                return backend
+        return None
+
+
+class Router(object):
+    """forward the requests of the nodes to a pool of backends. join_nodes is the set of the node names that use a Join.
+    If compress_threshold is given, the requests of at least this number of bytes are compressed with gzip on their way to the
+    backends, and the backends are asked to compress their responses."""
+
+    def __init__(self, backends, join_nodes=(), health_interval=5., timeout=120., compress_threshold=None):
+        self.backends = [Backend(url) if isinstance(url, str) else url for url in backends]
+        if len(self.backends) == 0:
+            raise Exception("the router needs at least one backend")
+        self.join_nodes = set(join_nodes)
+        self.ring = HashRing(self.backends)
+        self.health_interval = health_interval
+        self.timeout = timeout
+        self.compress_threshold = compress_threshold
+        self._lock = threading.Lock()
+        self._next = 0  # round-robin among the equally loaded backends
+
+        self.app = Flask(__name__)
+        self.app.add_url_rule('/', 'jsonrpc', self.route_jsonrpc, methods=['POST'])
+        self.app.add_url_rule('/health', 'health', self.route_health, methods=['GET'])
+        self.app.add_url_rule('/ready', 'ready', self.route_health, methods=['GET'])
+        self.app.add_url_rule('/<name>', 'direct', self.route_direct, methods=['POST'])
+
+    # selection of the backends
+
+    def select(self, name, msg, exclude=()):
+        """return the backend to which the message msg for the node name must be sent"""
+        def accept(backend):
+            return backend.healthy and backend not in exclude
+
+        if name in self.join_nodes and isinstance(msg, dict) and '_msgid' in msg:
+            return self.ring.lookup(str(msg['_msgid']), accept)
+
+        with self._lock:
+            n = len(self.backends)
+            self._next = (self._next + 1) % n
+            candidates = [b for b in self.backends[self._next:] + self.backends[:self._next] if accept(b)]
+            if not candidates:
+                return None
+            return min(candidates, key=lambda b: b.inflight)
+
+    def forward(self, name, msg, path, body):
+        """send body to the path of a selected backend and return a Flask response. If the connection to a backend fails, it is
+        marked as unhealthy and the next selected backend is tried. Once the request has been sent, it is never sent again
+        (the node may not be idempotent): a backend answering too late gives a 504 and a broken connection a 502."""
+        headers = {'Content-Type': "application/json"}
+        if self.compress_threshold is not None:
+            # only ask for what the client accepts so that the response can be passed through without decompression
+            accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+            headers['Accept-Encoding'] = ", ".join(e for e in supported_encodings() if e in accepted) or "gzip"
+            if len(body) >= self.compress_threshold:
+                body = compress(body, "gzip")
+                headers['Content-Encoding'] = "gzip"
+
+        tried = []
+        while True:
+            backend = self.select(name, msg, exclude=tried)
+            if backend is None:
+                return self._error(503, "no healthy backend available")
+            tried.append(backend)
+
+            with self._lock:
+                backend.inflight += 1
+            try:
+                req = urllib.request.Request(backend.url + path, data=body, headers=headers)
+                with urllib.request.urlopen(req, timeout=self.timeout) as r:
+                    return self._response(r.status, r.headers, r.read())
+            except urllib.error.HTTPError as e:
+                return self._response(e.code, e.headers, e.read())
+            except urllib.error.URLError:
+                # urlopen raises URLError only when the connection or the sending of the request failed
+                backend.healthy = False
+            except socket.timeout:
+                return self._error(504, "backend %s did not answer in time" % backend.url)
+            except (ConnectionError, http.client.HTTPException) as e:
+                backend.healthy = False
+                return self._error(502, "connection to backend %s broken: %s" % (backend.url, e))
+            finally:
+                with self._lock:
+                    backend.inflight -= 1
+
+    @staticmethod
+    def _response(status, headers, data):
+        """make the response of the router from the response of a backend. A compressed response is passed through if the client
+        accepts its encoding, otherwise it is decompressed (and possibly compressed again by the CompressionMiddleware)."""
+        encoding = headers.get('Content-Encoding')
+        if encoding and encoding != "identity":
+            if encoding in accepted_encodings(request.headers.get('Accept-Encoding', '')):
+                response = Response(data, status=status, content_type="application/json")
+                response.headers['Content-Encoding'] = encoding
+                return response
+            try:
+                data = decompress(data, encoding)
+            except (ValueError, OSError, EOFError) as e:
+                return Router._error(502, "cannot decode the %s response of the backend: %s" % (encoding, e))
+        return Response(data, status=status, content_type="application/json")
+
+    @staticmethod
+    def _error(status, message):
+        return Response(json.dumps({'error': message}), status=status, content_type="application/json")
+
+    # health checks
+
+    def check_health(self):
+        """check once the health of all the backends. A backend is healthy when it is ready (its warm-up is done)"""
+        for backend in self.backends:
+            try:
+                with urllib.request.urlopen(backend.url + "/ready", timeout=self.health_interval) as r:
+                    backend.healthy = (r.status == 200)
+            except (urllib.error.URLError, ConnectionError, OSError):
+                backend.healthy = False
+
+    def start_health_checks(self):
+        """check the health of the backends every health_interval seconds in a daemon thread"""
+        def loop():
+            while True:
+                self.check_health()
+                time.sleep(self.health_interval)
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    # routes
+
+    def route_jsonrpc(self):
+        body = request.get_data()
+        try:
+            rpc = json.loads(body)
+            name, msg = rpc['method'], rpc['params']['msg']
+        except (ValueError, KeyError, TypeError):
+            name, msg = None, None  # let the backend answer with the JSON-RPC error
+        return self.forward(name, msg, '/', body)
+
+    def route_direct(self, name):
+        body = request.get_data()
+        try:
+            msg = json.loads(body)['msg']
+        except (ValueError, KeyError, TypeError):
+            msg = None
+        return self.forward(name, msg, '/' + name, body)
+
+    def route_health(self):
+        healthy = any(b.healthy for b in self.backends)
+        return Response("ok" if healthy else "no healthy backend", status=200 if healthy else 503)
@@ -7,23 +7,109 @@ import inspect
 import pprint
 import json
 import copy
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from flask import Flask
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request, Response
 
 from jsonrpc.backend.flask import api
 # https://media.readthedocs.org/pdf/json-rpc/latest/json-rpc.pdf
 
 from pynodered.core import silent_node_waiting
+from pynodered.compression import CompressionMiddleware
+from pynodered.executors import make_runner
+from pynodered.router import Router
 
 app = Flask(__name__)
 app.register_blueprint(api.as_blueprint())
 
 
+# set when the warm-up of all the registered nodes is finished
+ready = threading.Event()
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return "ok"
+
+
+@app.route('/ready', methods=['GET'])
+def route_ready():
+    if ready.is_set():
+        return "ready"
+    return Response("warming up", status=503)
+
+
+def warmup_nodes(classes, max_workers=None):
+    """call the warmup method of all the node classes (or their runners) in parallel and then set the ready event. A failing
+    warm-up is reported but does not prevent the server to become ready."""
+
+    def warmup(obj):
+        try:
+            obj.warmup()
+        except Exception:
+            print("Warm-up of %s failed:" % obj.name)
+            traceback.print_exc()
+
+    try:
+        if classes:
+            with ThreadPoolExecutor(max_workers=max_workers or len(classes)) as executor:
+                list(executor.map(warmup, classes))
+    finally:
+        ready.set()
+
+
+def compress_threshold(value):
+    """argparse type of --compress-threshold. 0 would mean 'compress everything' for the server but 'disabled' for the generated
+    Node-RED blocks, so only positive values are accepted and 'disabled' is the absence of the option."""
+    threshold = int(value)
+    if threshold < 1:
+        raise argparse.ArgumentTypeError("the compression threshold must be at least 1 byte")
+    return threshold
+
+
 def node_directory(package_name):
     return Path.home() / ".node-red" / "node_modules" / package_name  # assume this also work on MacOS and Windows...
 
 
+def direct_route(name, run):
+    """make a view for the direct route of a node. The request body is a json object {"msg": ..., "config": ...} and the response body
+    is the json encoded result of run, without the JSON-RPC envelope. A malformed request gets a 400 and an exception raised by
+    the node a 500, both with a json body {"error": ..., "type": ...}."""
+
+    def error(status, e):
+        body = {'error': "%s: %s" % (type(e).__name__, e), 'type': type(e).__name__}
+        return Response(json.dumps(body), status=status, content_type="application/json")
+
+    def view():
+        try:
+            params = json.loads(request.get_data())
+            msg, config = params['msg'], params['config']
+        except (ValueError, KeyError, TypeError) as e:
+            return error(400, e)
+        try:
+            body = json.dumps(run(msg, config))
+        except Exception as e:
+            app.logger.exception("Exception in node %s", name)
+            return error(500, e)
+        return Response(body, content_type="application/json")
+
+    return view
+
+
+def register_node(obj):
+    """instantiate the node class obj in its executor and make it available both through the JSON-RPC dispatcher (at /) and
+    through the direct route /<name>. Return the runner of the node."""
+
+    runner = make_runner(obj)
+    run = silent_node_waiting(runner)
+    api.dispatcher.add_method(run, obj.name)
+    app.add_url_rule('/' + obj.name, 'node_' + obj.name, direct_route(obj.name, run), methods=['POST'])
+    return runner
+
+
 def main():
     parser = argparse.ArgumentParser(prog='pynodered')
     parser.add_argument('--noinstall', action="store_true",
@@ -31,6 +117,13 @@ def main():
     parser.add_argument('--port',
                         help="port to use by Flask to run the Python server handling the request from Node-RED",
                         default=5051)
+    parser.add_argument('--host',
+                        help="interface on which the server listens. Use 0.0.0.0 to accept requests from other hosts, e.g. when running as a backend of a router",
+                        default='127.0.0.1')
+    parser.add_argument('--backend', action="append", default=[],
+                        help="run in router mode and forward the requests to this pynodered backend (host:port). Repeat the option for each backend")
+    parser.add_argument('--compress-threshold', type=compress_threshold, default=None,
+                        help="compress (gzip or zstd) the requests and responses of at least this number of bytes (>= 1). Compression is disabled when the option is not given")
     parser.add_argument('filenames', help='list of python file names or module names', nargs='+')
     args = parser.parse_args(sys.argv[1:])
 
@@ -48,7 +141,8 @@ def main():
         }
     }
 
-    registered = 0
+    registered = []
+    join_nodes = set()
 
     for path in args.filenames:
 
@@ -91,19 +185,22 @@ def main():
             if hasattr(obj, "install") and hasattr(obj, "work") and hasattr(obj, "run") and hasattr(obj, "name"):
                 print(f"From {name} register {obj.name}")
                 if not args.noinstall:
-                    obj.install(node_dir, args.port)
+                    obj.install(node_dir, args.port, args.compress_threshold)
                     print("Install %s" % name)
                     packages[package_name]["node-red"]["nodes"][obj.name] = obj.name + '.js'
 
-                inst = obj()
-                api.dispatcher.add_method(silent_node_waiting(inst.run), obj.name)
-                registered += 1
+                if args.backend:
+                    if getattr(obj, "join", None) is not None:
+                        join_nodes.add(obj.name)
+                    registered.append(obj)
+                else:
+                    registered.append(register_node(obj))
 
                 # obj can run an http_server if it has one
-                if hasattr(obj, "http_server"):
+                if hasattr(obj, "http_server") and not args.backend:
                     obj.http_server(app)
 
-    if registered == 0:
+    if len(registered) == 0:
         raise Exception("Zero function or class to register to Node-RED has been found. Check your python files")
 
     if not args.noinstall:
@@ -117,7 +214,16 @@ def main():
     #     # and rules that require parameters
     #     print(rule.methods,rule.endpoint)
 
-    app.run(host='127.0.0.1', port=args.port)  # , debug=True)
+    if args.backend:
+        router = Router(args.backend, join_nodes=join_nodes, compress_threshold=args.compress_threshold)
+        router.start_health_checks()
+        router.app.wsgi_app = CompressionMiddleware(router.app.wsgi_app, args.compress_threshold)
+        router.app.run(host=args.host, port=args.port, threaded=True)
+    else:
+        # warm-up while serving, /ready tells Node-RED when it is done
+        threading.Thread(target=warmup_nodes, args=(registered,), daemon=True).start()
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app, args.compress_threshold)
+        app.run(host=args.host, port=args.port)  # , debug=True)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,106 @@
+"""Storage backends for the partial messages of a Join.
+
+A storage keeps the payloads received for each '_msgid' until all the expected topics have arrived. The messages are stored
+under a namespace (the name of the Join, by default the name of its node) so that several joins can share a storage. The push method is atomic:
+it stores a payload and, if the message is then complete, removes it and returns it. This way the completion of a message is
+detected exactly once even when several threads or processes share the storage.
+"""
+
+import collections
+import json
+import os
+import sqlite3
+import threading
+
+
+class MemoryStorage(object):
+    """keep the partial messages in a dict in the memory of the process. This is the default storage of Join."""
+
+    def __init__(self):
+        self.mem = collections.defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def push(self, namespace, msgid, topic, payload, expected_topics):
+        """store payload and return the dict of the payloads by topic if all expected_topics have arrived, None otherwise.
+        If expected_topics is None, the payload is only stored."""
+        with self._lock:
+            parts = self.mem[(namespace, msgid)]
+            parts[topic] = payload
+            if expected_topics is not None and all(t in parts for t in expected_topics):
+                return self.mem.pop((namespace, msgid))
+            return None
+
+    def get(self, namespace, msgid):
+        with self._lock:
+            return dict(self.mem.get((namespace, msgid), {}))
+
+    def pop(self, namespace, msgid):
+        with self._lock:
+            return self.mem.pop((namespace, msgid), {})
+
+
+class SQLiteStorage(object):
+    """keep the partial messages in a SQLite database in WAL mode. The database file can be shared by several worker processes on
+    the same host, so that the parts of a join do not need to be received by the same process. Payloads must be json serializable.
+    """
+
+    def __init__(self, path, timeout=30.):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS join_parts (namespace TEXT NOT NULL, msgid TEXT NOT NULL, "
+                         "topic TEXT NOT NULL, payload TEXT, PRIMARY KEY (namespace, msgid, topic))")
+
+    def _connection(self):
+        # sqlite connections can not be shared between threads nor inherited across a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def push(self, namespace, msgid, topic, payload, expected_topics):
+        """store payload and return the dict of the payloads by topic if all expected_topics have arrived, None otherwise.
+        If expected_topics is None, the payload is only stored."""
+        conn = self._connection()
+        msgid = str(msgid)
+        # BEGIN IMMEDIATE takes the write lock, so the insertion, the check and the deletion are seen as one step by the others
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR REPLACE INTO join_parts VALUES (?, ?, ?, ?)",
+                         (namespace, msgid, topic, json.dumps(payload)))
+            parts = self._select(conn, namespace, msgid)
+            if expected_topics is not None and all(t in parts for t in expected_topics):
+                conn.execute("DELETE FROM join_parts WHERE namespace = ? AND msgid = ?", (namespace, msgid))
+            else:
+                parts = None
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return parts
+
+    def get(self, namespace, msgid):
+        return self._select(self._connection(), namespace, str(msgid))
+
+    def pop(self, namespace, msgid):
+        conn = self._connection()
+        msgid = str(msgid)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            parts = self._select(conn, namespace, msgid)
+            conn.execute("DELETE FROM join_parts WHERE namespace = ? AND msgid = ?", (namespace, msgid))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return parts
+
+    @staticmethod
+    def _select(conn, namespace, msgid):
+        rows = conn.execute("SELECT topic, payload FROM join_parts WHERE namespace = ? AND msgid = ?", (namespace, msgid))
+        return {topic: json.loads(payload) for topic, payload in rows}
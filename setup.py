@@ -33,6 +33,7 @@ setup(
     ],
     description="make python function easily accessible from Node-RED ",
     install_requires=requirements,
+    extras_require={'zstd': ['zstandard']},
     license="GNU General Public License v3",
     long_description=readme, #+ '\n\n' + history,
     include_package_data=True,
@@ -7,6 +7,8 @@ import pytest
 
 
 import pynodered
+from pynodered import node_red
+from pynodered.core import NodeWaiting
 
 
 @pytest.fixture
@@ -23,3 +25,238 @@ def test_content(response):
     """Sample pytest test function with the pytest fixture as an argument."""
     # from bs4 import BeautifulSoup
     # assert 'GitHub' in BeautifulSoup(response.content).title.string
+
+
+@node_red(category="pyfuncs")
+def upper_case(node, msg):
+
+    msg['payload'] = msg['payload'].upper()
+    return msg
+
+
+@node_red(category="pyfuncs", join=("a", "b"))
+def concat(node, msg):
+
+    a, b = node.join(msg)
+    msg['payload'] = a + b
+    return msg
+
+
+def maybe_wait(node, msg):
+    if msg['payload'] == "wait":
+        raise NodeWaiting
+    if msg['payload'] == "fail":
+        raise ValueError("failed")
+    msg['payload'] = msg['payload'].upper()
+    return msg
+
+
+thread_node = node_red(name="thread_node", executor="thread", workers=2)(maybe_wait)
+process_node = node_red(name="process_node", executor="process", workers=2)(maybe_wait)
+
+
+@node_red(category="pyfuncs")
+def not_serializable(node, msg):
+
+    msg['payload'] = {1, 2}
+    return msg
+
+
+@pytest.fixture(scope="module")
+def client():
+    from pynodered import server
+
+    runners = []
+    for obj in (upper_case, concat, not_serializable, thread_node, process_node):
+        if obj.name not in server.api.dispatcher:
+            runners.append(server.register_node(obj))
+    yield server.app.test_client()
+    for runner in runners:
+        runner.shutdown()
+
+
+def test_direct_route(client):
+    r = client.post('/upper_case', json={'msg': {'payload': 'abc'}, 'config': {}})
+    assert r.status_code == 200
+    assert r.get_json() == {'payload': 'ABC'}
+
+
+def test_direct_route_bad_request(client):
+    r = client.post('/upper_case', data="not json", content_type="application/json")
+    assert r.status_code == 400 and r.get_json()['type'] == 'JSONDecodeError'
+    r = client.post('/upper_case', json={'msg': {'payload': 'abc'}})
+    assert r.status_code == 400 and r.get_json()['type'] == 'KeyError'
+
+
+def test_direct_route_exception_logged(client, caplog):
+    r = client.post('/upper_case', json={'msg': {'topic': 'no payload'}, 'config': {}})
+    assert r.status_code == 500
+    assert r.get_json() == {'error': "KeyError: 'payload'", 'type': 'KeyError'}
+    assert "Exception in node upper_case" in caplog.text
+    assert "Traceback" in caplog.text
+
+
+def test_direct_route_not_serializable(client, caplog):
+    r = client.post('/not_serializable', json={'msg': {'payload': 'abc'}, 'config': {}})
+    assert r.status_code == 500
+    assert r.get_json()['type'] == 'TypeError'
+    assert "Exception in node not_serializable" in caplog.text
+
+
+def test_jsonrpc_route(client):
+    r = client.post('/', json={'jsonrpc': '2.0', 'method': 'upper_case', 'id': '1',
+                               'params': {'msg': {'payload': 'abc'}, 'config': {}}})
+    assert r.get_json()['result'] == {'payload': 'ABC'}
+
+
+def test_direct_route_join(client):
+    r = client.post('/concat', json={'msg': {'_msgid': '1', 'topic': 'b', 'payload': 'y'}, 'config': {}})
+    assert r.get_json() is None
+    r = client.post('/concat', json={'msg': {'_msgid': '1', 'topic': 'a', 'payload': 'x'}, 'config': {}})
+    assert r.get_json()['payload'] == 'xy'
+
+
+def test_warmup_and_ready(client):
+    import threading
+    from pynodered import server
+
+    started, release = threading.Barrier(3), threading.Event()
+
+    def slow_warmup(cls):
+        started.wait(timeout=5)  # both warm-ups must run in parallel to pass the barrier
+        release.wait(timeout=5)
+
+    warmed = [node_red(name="warm%i" % i, warmup=slow_warmup)(lambda node, msg: msg) for i in range(2)]
+
+    server.ready.clear()
+    thread = threading.Thread(target=server.warmup_nodes, args=(warmed,))
+    thread.start()
+    started.wait(timeout=5)
+    assert client.get('/ready').status_code == 503
+    release.set()
+    thread.join()
+    assert client.get('/ready').status_code == 200
+
+
+@pytest.mark.parametrize("name", ["thread_node", "process_node"])
+def test_executors(client, name):
+    r = client.post('/' + name, json={'msg': {'payload': 'abc'}, 'config': {}})
+    assert r.get_json() == {'payload': 'ABC'}
+    r = client.post('/' + name, json={'msg': {'payload': 'wait'}, 'config': {}})
+    assert r.status_code == 200 and r.get_json() is None
+    r = client.post('/' + name, json={'msg': {'payload': 'fail'}, 'config': {}})
+    assert r.status_code == 500 and r.get_json() == {'error': 'ValueError: failed', 'type': 'ValueError'}
+    r = client.post('/', json={'jsonrpc': '2.0', 'method': name, 'id': '1',
+                               'params': {'msg': {'payload': 'fail'}, 'config': {}}})
+    assert 'error' in r.get_json()
+
+
+def failing_warmup(cls):
+    raise RuntimeError("no model")
+
+
+def getpid(node, msg):
+    import os
+    return os.getpid()
+
+
+def test_process_executor_failing_warmup():
+    from pynodered.executors import make_runner
+
+    runner = make_runner(node_red(name="failing_warmup", executor="process", workers=1, warmup=failing_warmup)(getpid))
+    try:
+        runner.warmup()
+        assert isinstance(runner({}, {}), int)
+        assert isinstance(runner({}, {}), int)
+    finally:
+        runner.shutdown()
+
+
+def test_process_executor_starts_workers_eagerly():
+    import multiprocessing
+    from pynodered.executors import make_runner
+
+    before = len(multiprocessing.active_children())
+    runner = make_runner(node_red(name="eager", executor="process", workers=2)(getpid))
+    try:
+        assert len(multiprocessing.active_children()) == before + 2
+    finally:
+        runner.shutdown()
+
+
+def test_process_executor_dead_worker():
+    import os
+    import signal
+    import time
+    from concurrent.futures.process import BrokenProcessPool
+    from pynodered.executors import make_runner
+
+    runner = make_runner(node_red(name="dead_worker", executor="process", workers=1)(getpid))
+    try:
+        pid = runner({}, {})
+        os.kill(pid, signal.SIGKILL)
+        time.sleep(0.5)  # let the pool notice the dead worker
+        try:
+            new_pid = runner({}, {})
+        except BrokenProcessPool:
+            new_pid = runner({}, {})
+        assert new_pid != pid
+        assert runner({}, {}) == new_pid
+    finally:
+        runner.shutdown()
+
+
+def test_process_executor_join_needs_shared_storage(tmp_path):
+    from pynodered.core import Join
+    from pynodered.storage import SQLiteStorage
+
+    with pytest.raises(Exception, match="shared by the worker processes"):
+        node_red(name="bad_join", executor="process", join=["a", "b"])(maybe_wait)
+
+    node_red(name="single_worker_join", executor="process", workers=1, join=["a", "b"])(maybe_wait)
+    node_red(name="shared_join", executor="process",
+             join=Join(["a", "b"], storage=SQLiteStorage(tmp_path / "join.db")))(maybe_wait)
+
+
+def test_compression(client):
+    import gzip
+    import json
+    from werkzeug.test import Client
+    from pynodered import server
+    from pynodered.compression import CompressionMiddleware
+
+    compressed = Client(CompressionMiddleware(server.app.wsgi_app, threshold=1000))
+    body = json.dumps({'msg': {'payload': 'abc' * 1000}, 'config': {}}).encode()
+
+    r = compressed.post('/upper_case', data=gzip.compress(body), headers={'Content-Type': 'application/json',
+                                                                         'Content-Encoding': 'gzip',
+                                                                         'Accept-Encoding': 'gzip'})
+    assert r.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(r.data)) == {'payload': 'ABC' * 1000}
+
+    # small messages are not compressed
+    r = compressed.post('/upper_case', json={'msg': {'payload': 'abc'}, 'config': {}}, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in r.headers
+    assert r.get_json() == {'payload': 'ABC'}
+
+
+def test_compression_corrupt_body(client):
+    from werkzeug.test import Client
+    from pynodered import server
+    from pynodered.compression import CompressionMiddleware
+
+    compressed = Client(CompressionMiddleware(server.app.wsgi_app, threshold=1000))
+    r = compressed.post('/upper_case', data=b"junk", headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+    assert r.status_code == 415
+
+
+def test_compression_corrupt_zstd_body(client):
+    pytest.importorskip("zstandard")
+    from werkzeug.test import Client
+    from pynodered import server
+    from pynodered.compression import CompressionMiddleware, compress
+
+    compressed = Client(CompressionMiddleware(server.app.wsgi_app, threshold=1000))
+    for body in (b"junk", compress(b'{"msg": {"payload": "abc"}, "config": {}}', "zstd")[:-3]):
+        r = compressed.post('/upper_case', data=body, headers={'Content-Type': 'application/json', 'Content-Encoding': 'zstd'})
+        assert r.status_code == 415
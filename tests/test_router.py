@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the router mode of `pynodered.server`."""
+
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from pynodered.compression import zstandard
+from pynodered.router import Backend, HashRing, Router
+
+
+def test_hashring_is_stable():
+    backends = [Backend("localhost:%i" % p) for p in (1, 2, 3)]
+    ring = HashRing(backends)
+    keys = ["msg%i" % i for i in range(300)]
+    before = {k: ring.lookup(k) for k in keys}
+
+    # all backends get keys
+    assert set(before.values()) == set(backends)
+
+    # only the keys of the removed backend move
+    after = {k: ring.lookup(k, lambda b: b is not backends[0]) for k in keys}
+    for k in keys:
+        if before[k] is not backends[0]:
+            assert after[k] is before[k]
+
+
+def test_select_least_loaded():
+    router = Router(["localhost:1", "localhost:2"], join_nodes={"joined"})
+    b1, b2 = router.backends
+    b1.inflight = 3
+    assert router.select("simple", {'_msgid': 'x'}) is b2
+    b2.healthy = False
+    assert router.select("simple", {'_msgid': 'x'}) is b1
+    b1.healthy = False
+    assert router.select("simple", {'_msgid': 'x'}) is None
+
+
+def test_select_join_sticky():
+    router = Router(["localhost:1", "localhost:2", "localhost:3"], join_nodes={"joined"})
+    backend = router.select("joined", {'_msgid': 'x'})
+    for b in router.backends:
+        b.inflight = 0 if b is not backend else 10
+    assert router.select("joined", {'_msgid': 'x'}) is backend
+
+
+NODES = textwrap.dedent("""
+    import os
+    from pynodered import node_red
+
+    @node_red(category="test")
+    def whoami(node, msg):
+        msg['payload'] = os.getpid()
+        return msg
+
+    @node_red(category="test", join=["a", "b"])
+    def concat(node, msg):
+        a, b = node.join(msg)
+        msg['payload'] = a + b
+        return msg
+""")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, timeout=20):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        try:
+            with urllib.request.urlopen(url + "/ready", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server %s did not start" % url)
+
+
+@pytest.fixture(scope="module")
+def backends(tmp_path_factory):
+    path = tmp_path_factory.mktemp("nodes") / "nodes.py"
+    path.write_text(NODES)
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent))
+
+    procs, urls = [], []
+    for i in range(3):
+        port = free_port()
+        procs.append(subprocess.Popen([sys.executable, "-m", "pynodered.server", "--noinstall", "--port", str(port),
+                                       "--compress-threshold", "1000", str(path)],
+                                      env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        urls.append("http://127.0.0.1:%i" % port)
+    try:
+        for url in urls:
+            wait_ready(url)
+        yield urls
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait()
+
+
+def test_router_processes(backends):
+    router = Router(backends, join_nodes={"concat"})
+    client = router.app.test_client()
+
+    pids = set()
+    for i in range(20):
+        r = client.post('/whoami', json={'msg': {'_msgid': str(i), 'payload': ''}, 'config': {}})
+        assert r.status_code == 200
+        pids.add(r.get_json()['payload'])
+    assert len(pids) == len(backends)
+
+    for i in range(20):
+        msgid = "join%i" % i
+        r = client.post('/concat', json={'msg': {'_msgid': msgid, 'topic': 'b', 'payload': 'y'}, 'config': {}})
+        assert r.get_json() is None
+        r = client.post('/', json={'jsonrpc': '2.0', 'method': 'concat', 'id': '1',
+                                   'params': {'msg': {'_msgid': msgid, 'topic': 'a', 'payload': 'x'}, 'config': {}}})
+        assert r.get_json()['result']['payload'] == 'xy'
+
+
+def test_router_unhealthy_backend(backends):
+    router = Router(backends + ["127.0.0.1:%i" % free_port()])
+    client = router.app.test_client()
+    router.check_health()
+    assert not router.backends[-1].healthy
+
+    router.backends[-1].healthy = True  # forwarding must also detect it
+    for i in range(5):
+        r = client.post('/whoami', json={'msg': {'_msgid': str(i), 'payload': ''}, 'config': {}})
+        assert r.status_code == 200
+    assert not router.backends[-1].healthy
+
+
+@pytest.fixture
+def silent_server():
+    """a server accepting the connections, reading the request and then either never answering or closing the connection"""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(5)
+    state = {'connections': 0, 'close': False}
+
+    def serve():
+        conns = []
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                break
+            state['connections'] += 1
+            conn.recv(65536)
+            if state['close']:
+                conn.close()
+            else:
+                conns.append(conn)  # keep it open, never answer
+        for conn in conns:
+            conn.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield "127.0.0.1:%i" % listener.getsockname()[1], state
+    listener.close()
+
+
+def test_router_backend_timeout(silent_server):
+    url, state = silent_server
+    router = Router([url], timeout=0.5)
+    r = router.app.test_client().post('/whoami', json={'msg': {'payload': ''}, 'config': {}})
+    assert r.status_code == 504
+    assert 'error' in r.get_json()
+
+
+def test_router_no_failover_after_sending(silent_server, backends):
+    url, state = silent_server
+    state['close'] = True
+    router = Router([url] + backends)
+    router._next = len(router.backends) - 1  # the next selection starts with the silent server
+    r = router.app.test_client().post('/whoami', json={'msg': {'payload': ''}, 'config': {}})
+    assert r.status_code == 502
+    assert state['connections'] == 1
+    assert not router.backends[0].healthy
+
+
+def test_router_compression(backends):
+    import gzip
+    import json
+
+    router = Router(backends, compress_threshold=1000)
+    client = router.app.test_client()
+    big = {'msg': {'payload': 'x', 'data': list(range(1000))}, 'config': {}}
+
+    # the compressed response of the backend is passed through to a client accepting gzip
+    r = client.post('/whoami', json=big, headers={'Accept-Encoding': 'gzip'})
+    assert r.status_code == 200
+    assert r.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(r.data))['data'] == list(range(1000))
+
+    # a client accepting zstd too gets the preferred encoding of the backend
+    r = client.post('/whoami', json=big, headers={'Accept-Encoding': 'zstd, gzip'})
+    assert r.headers['Content-Encoding'] == ('zstd' if zstandard is not None else 'gzip')
+
+    # and decompressed for the others
+    r = client.post('/whoami', json=big)
+    assert 'Content-Encoding' not in r.headers
+    assert r.get_json()['data'] == list(range(1000))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the Join storages in `pynodered.storage`."""
+
+import multiprocessing
+
+import pytest
+
+from pynodered.core import Join, NodeWaiting, node_red
+from pynodered.storage import MemoryStorage, SQLiteStorage
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStorage()
+    return SQLiteStorage(tmp_path / "join.db")
+
+
+def test_join(storage):
+    join = Join(["a", "b", "c"], storage=storage)
+    with pytest.raises(NodeWaiting):
+        join({'_msgid': '1', 'topic': 'c', 'payload': 3})
+    with pytest.raises(NodeWaiting):
+        join({'_msgid': '1', 'topic': 'a', 'payload': [1]})
+    assert join({'_msgid': '1', 'topic': 'b', 'payload': "2"}) == [[1], "2", 3]
+    assert storage.get(join.namespace, '1') == {}
+
+
+def test_push_ready_pop(storage):
+    join = Join(["a", "b"], storage=storage)
+    join.push({'_msgid': '1', 'topic': 'a', 'payload': 1})
+    assert not join.ready({'_msgid': '1'})
+    join.push({'_msgid': '1', 'topic': 'b', 'payload': 2})
+    assert join.ready({'_msgid': '1'})
+    assert join.get_messages({'_msgid': '1'}) == [1, 2]
+    assert join.pop({'_msgid': '1'}) == [1, 2]
+    assert not join.ready({'_msgid': '1'})
+
+
+def test_joins_sharing_a_storage(storage):
+    join1 = Join(["a", "b"], storage=storage, name="node1")
+    join2 = Join(["a", "c"], storage=storage, name="node2")
+    with pytest.raises(NodeWaiting):
+        join1({'_msgid': '1', 'topic': 'a', 'payload': 1})
+    with pytest.raises(NodeWaiting):
+        join2({'_msgid': '1', 'topic': 'c', 'payload': 3})
+    assert join2({'_msgid': '1', 'topic': 'a', 'payload': 2}) == [2, 3]
+    assert join1({'_msgid': '1', 'topic': 'b', 'payload': 4}) == [1, 4]
+
+
+def test_join_named_after_node(tmp_path):
+    storage = SQLiteStorage(tmp_path / "join.db")
+    node1 = node_red(name="node1", join=Join(["a", "b"], storage=storage))(lambda node, msg: node.join(msg))
+    node2 = node_red(name="node2", join=Join(["a", "c"], storage=storage))(lambda node, msg: node.join(msg))
+    assert (node1.join.name, node2.join.name) == ("node1", "node2")
+
+    with pytest.raises(NodeWaiting):
+        node1().run({'_msgid': '1', 'topic': 'a', 'payload': 1}, {})
+    with pytest.raises(NodeWaiting):
+        node2().run({'_msgid': '1', 'topic': 'c', 'payload': 3}, {})
+    assert node1().run({'_msgid': '1', 'topic': 'b', 'payload': 2}, {}) == [1, 2]
+
+
+def _push_topic(path, topic, n, queue):
+    storage = SQLiteStorage(path)
+    completed = 0
+    for i in range(n):
+        if storage.push("node", str(i), topic, i, ["a", "b", "c", "d"]) is not None:
+            completed += 1
+    queue.put(completed)
+
+
+def test_sqlite_exactly_once_across_processes(tmp_path):
+    path = tmp_path / "join.db"
+    SQLiteStorage(path)  # create the table
+    n = 200
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_push_topic, args=(path, topic, n, queue)) for topic in "abcd"]
+    for p in procs:
+        p.start()
+    completed = sum(queue.get(timeout=60) for p in procs)
+    for p in procs:
+        p.join()
+    assert completed == n